@@ -1,40 +1,84 @@
 import urllib.request
 import json
 import os
-from io import TextIOWrapper
+
+# orjson (C) validates lines several times faster than the stdlib parser;
+# fall back to json if it isn't installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # --- Configuration ---
 # The file that failed to load in your browser: 'flower.ndjson'
 DATA_URL = 'https://storage.googleapis.com/quickdraw_dataset/full/simplified/flower.ndjson'
 OUTPUT_FILENAME = 'flower_data_local.ndjson'
 MAX_LINES_TO_SAVE = 500 
+# Only the first few MB of the (very large) file are needed for 500 lines,
+# so ask the server for it in 2 MB HTTP Range requests until we have enough
+RANGE_BYTES = 2 * 1024 * 1024   # 2 MB
 
 print(f"Starting download of {DATA_URL}...")
 
 # Use try/except for robust error handling, similar to the browser code
 try:
-    # Open the URL and treat it as a stream
-    with urllib.request.urlopen(DATA_URL) as response:
-        # Wrap the response stream to decode it as text (utf-8)
-        text_stream = TextIOWrapper(response, encoding='utf-8')
-        
-        # Open a local file to write the results
-        with open(OUTPUT_FILENAME, 'w', encoding='utf-8') as outfile:
-            lines_saved = 0
-            
-            # Read line by line until we reach the limit
-            for line in text_stream:
-                if lines_saved >= MAX_LINES_TO_SAVE:
-                    break
-                
-                # Optional: Validate the JSON structure before saving (Good practice)
-                try:
-                    # Check if the line is valid JSON before writing it
-                    json.loads(line) 
-                    outfile.write(line)
-                    lines_saved += 1
-                except json.JSONDecodeError:
-                    print(f"Skipping malformed line at count {lines_saved}.")
+    # Collect the valid lines first, then write them out in a single call
+    valid_lines = []
+    # Byte offset in the remote file where the next range starts
+    offset = 0
+
+    while len(valid_lines) < MAX_LINES_TO_SAVE:
+        # Request only the next RANGE_BYTES of the file
+        request = urllib.request.Request(DATA_URL, headers={'Range': f'bytes={offset}-{offset + RANGE_BYTES - 1}'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                # 200 instead of 206 means the server ignored Range and is sending the
+                # whole file, so skip the part we've already processed
+                if response.status != 206 and offset:
+                    response.read(offset)
+                # Cap the read as well, so the full file is never read in one go
+                data = response.read(RANGE_BYTES)
+        except urllib.error.HTTPError as e:
+            if e.code == 416:  # Range Not Satisfiable: offset is already at the end of the file
+                break
+            raise
+
+        # A short read means this block reaches the end of the file
+        end_of_file = len(data) < RANGE_BYTES
+
+        # Otherwise the block almost always ends mid-line, so drop the incomplete
+        # last line and start the next range at its first byte
+        lines = data.splitlines(keepends=True)
+        partial_line = b''
+        if lines and not end_of_file and not lines[-1].endswith(b'\n'):
+            partial_line = lines.pop()
+
+        if not lines and not end_of_file:
+            print(f"Stopping: a single line is longer than {RANGE_BYTES} bytes. Increase RANGE_BYTES.")
+            break
+
+        offset += len(data) - len(partial_line)
+
+        for line in lines:
+            if len(valid_lines) >= MAX_LINES_TO_SAVE:
+                break
+
+            # Optional: Validate the JSON structure before saving (Good practice)
+            try:
+                # Check if the line is valid JSON before keeping it
+                json_loads(line)
+                valid_lines.append(line)
+            except ValueError:  # JSONDecodeError from either parser, or invalid UTF-8
+                print(f"Skipping malformed line at count {len(valid_lines)}.")
+
+        if end_of_file:
+            break
+
+    # Open a local file to write the results. Lines are copied through unchanged,
+    # so stay in binary and skip the UTF-8 decode/encode round-trip.
+    with open(OUTPUT_FILENAME, 'wb') as outfile:
+        outfile.writelines(valid_lines)
+    lines_saved = len(valid_lines)
 
     print(f"\n✅ Success! Saved {lines_saved} lines to '{OUTPUT_FILENAME}'.")
     print(f"You can now open '{OUTPUT_FILENAME}' in VS Code to view the data.")
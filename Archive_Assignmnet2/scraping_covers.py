@@ -1,9 +1,27 @@
-from playwright.sync_api import sync_playwright
-import requests
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import httpx
+import asyncio
 import os
-import time
+import re
+from io import BytesIO
 from PIL import Image # NEW: Import Pillow for image manipulation
 
+# libjpeg-turbo can crop a JPEG losslessly without decoding and re-encoding it.
+# Fall back to Pillow if PyTurboJPEG or the libjpeg-turbo library is missing.
+try:
+    from turbojpeg import TurboJPEG
+    JPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    JPEG = None
+
+# httpx only speaks HTTP/2 when the h2 package is installed (pip install "httpx[http2]").
+# Without it, downloads use a pool of HTTP/1.1 connections instead.
+try:
+    import h2
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
 # --- Setup ---
 # The target YouTube playlist URL
 PLAYLIST_URL = "https://www.youtube.com/playlist?list=PL3-sRm8xAzY9gpXTMGVHJWy_FMD67NBed"
@@ -13,110 +31,261 @@ THUMBNAIL_SELECTOR = "ytd-playlist-video-renderer ytd-thumbnail img"
 # Output directory for downloaded images
 OUTPUT_DIR = "youtube_thumbnails"
 
+# Video IDs of the playlist entries embedded in the playlist page's HTML (ytInitialData).
+# Each video's thumbnail lives at a fixed URL, so the IDs are all we need.
+PLAYLIST_VIDEO_ID_PATTERN = re.compile(r'"playlistVideoRenderer":\{"videoId":"([\w-]{11})"')
+# Present in the HTML when the playlist is longer than the first page the server sends
+PLAYLIST_CONTINUATION_MARKER = '"continuationItemRenderer"'
+THUMBNAIL_URL_TEMPLATE = "https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
 # Selector for the full playlist video row element, used for counting loaded videos
 VIDEO_ROW_SELECTOR = "ytd-playlist-video-renderer"
 
+# Browser-side count of loaded playlist rows. Returning one number is much cheaper
+# than creating a Playwright handle for every row just to count them.
+COUNT_VIDEO_ROWS_JS = "selector => document.querySelectorAll(selector).length"
+
+# Longest time to wait for the page to grow after each scroll before counting
+# the scroll as "no new videos"
+SCROLL_LOAD_TIMEOUT_MS = 3000
+
+# Browser-side check that the page has grown past the given height
+PAGE_GREW_JS = "height => document.body.scrollHeight > height"
+
+# Longest time to wait for lazy-loaded thumbnails to replace their placeholder src
+THUMBNAIL_LOAD_TIMEOUT_MS = 30000
+
+# Browser-side check that every thumbnail has a real (non data: URI) src
+ALL_THUMBNAILS_LOADED_JS = """
+selector => Array.from(document.querySelectorAll(selector))
+    .every(img => img.src && !img.src.startsWith('data:'))
+"""
+
+# Most connections opened to the thumbnail server. Over HTTP/2 httpx sends every
+# request on one connection anyway; this only matters if HTTP/1.1 is used.
+DOWNLOAD_POOL_SIZE = 16
+
+# Per-request timeout for downloads. Requests queued behind others for a free
+# connection aren't timed out while they wait for it (pool=None).
+DOWNLOAD_TIMEOUT = httpx.Timeout(10, pool=None)
+
+# A lossless JPEG crop must start on an MCU (block) boundary. MCUs are 8 or 16 px
+# tall depending on chroma subsampling, so a multiple of 16 is always valid.
+JPEG_MCU_SIZE = 16
 
-def crop_to_16_9(file_path):
+# Quality used when Pillow has to re-encode a cropped thumbnail
+JPEG_QUALITY = 85
+
+
+def crop_to_16_9(data):
     """
-    Crops the image at the given file_path to a 16:9 aspect ratio.
+    Crops JPEG image data to a 16:9 aspect ratio and returns the cropped bytes.
     It calculates the required height based on the width and removes excess 
     height equally from the top and bottom.
+
+    When libjpeg-turbo is available the crop is done directly on the compressed
+    JPEG data, so the image is never decoded or re-encoded (and loses no quality).
     """
-    try:
-        img = Image.open(file_path)
+    if JPEG is not None:
+        width, height, _, _ = JPEG.decode_header(data)
+    else:
+        img = Image.open(BytesIO(data))
         width, height = img.size
+    
+    # Calculate the required height for a 16:9 aspect ratio based on the current width
+    target_height = int(width * 9 / 16)
+    
+    if height <= target_height:
+        print(f"Skipping crop for 16:9. Image is already taller than or equal to 16:9.")
+        return data
+
+    # Calculate the total height to remove and the margin for the crop box
+    height_to_remove = height - target_height
+    top_margin = height_to_remove // 2
+    
+    if JPEG is not None:
+        # Snap the top edge to the nearest MCU boundary that still leaves
+        # target_height rows below it (a few pixels off-centre at most)
+        top_margin = min(
+            round(top_margin / JPEG_MCU_SIZE) * JPEG_MCU_SIZE,
+            height_to_remove // JPEG_MCU_SIZE * JPEG_MCU_SIZE,
+        )
+        cropped_data = JPEG.crop(data, 0, top_margin, width, target_height)
+    else:
+        # The bottom coordinate is the full height minus the height removed from the bottom.
+        # We use height_to_remove - top_margin to handle any remainder if height_to_remove is odd.
+        bottom_margin = height - (height_to_remove - top_margin) 
         
-        # Calculate the required height for a 16:9 aspect ratio based on the current width
-        target_height = int(width * 9 / 16)
+        # The crop box is (left, top, right, bottom)
+        crop_box = (0, top_margin, width, bottom_margin)
         
-        if height > target_height:
-            # Calculate the total height to remove and the margin for the crop box
-            height_to_remove = height - target_height
-            top_margin = height_to_remove // 2
-            
-            # The bottom coordinate is the full height minus the height removed from the bottom.
-            # We use height_to_remove - top_margin to handle any remainder if height_to_remove is odd.
-            bottom_margin = height - (height_to_remove - top_margin) 
-            
-            # The crop box is (left, top, right, bottom)
-            crop_box = (0, top_margin, width, bottom_margin)
-            
-            cropped_img = img.crop(crop_box)
-            cropped_img.save(file_path)
-            print(f"Cropped image to {width}x{target_height} (16:9).")
-        else:
-            print(f"Skipping crop for 16:9. Image is already taller than or equal to 16:9.")
-            
-    except Exception as e:
-        print(f"Error processing image {file_path}: {e}")
+        cropped_img = img.crop(crop_box)
+        buffer = BytesIO()
+        # Plain baseline encode: skip the extra Huffman-optimisation and progressive
+        # passes, and use 4:2:0 chroma subsampling (subsampling=2) like the source
+        cropped_img.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=False, progressive=False, subsampling=2)
+        cropped_data = buffer.getvalue()
 
+    print(f"Cropped image to {width}x{target_height} (16:9).")
+    return cropped_data
 
-def download_file(url, local_filename=None):
-    """Downloads a file from a URL to the local file system."""
+
+async def download_file(client, url, local_path, crop=False, missing_ok=False):
+    """
+    Downloads a file from a URL to local_path on the local file system.
+    With crop=True the image is cropped to 16:9 in memory before it is saved,
+    so it is written to disk only once instead of being saved, re-read and re-saved.
+    With missing_ok=True a 404 returns None without reporting it as a failure.
+    """
     if not url:
         print("Error: Empty URL provided for download.")
         return None
-    
-    # Generate a safe filename from the URL, or use a provided name
-    if local_filename is None:
-        # Use the last part of the URL (e.g., hqdefault.jpg)
-        local_filename = url.split("/")[-1]
-        
-    # Prepend the output directory to the filename
-    local_path = os.path.join(OUTPUT_DIR, local_filename)
 
     try:
-        # Use requests to download the file
-        with requests.get(url, stream=True, timeout=10) as r:
-            r.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-            with open(local_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        print(f"Downloaded: {local_path}")
-        return local_path
-    except requests.exceptions.RequestException as e:
+        # Use the shared client, so this request becomes one more stream on its connection
+        r = await client.get(url)
+        if missing_ok and r.status_code == 404:
+            return None
+        r.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+    except httpx.HTTPError as e:
         print(f"Failed to download {url}: {e}")
         return None
 
+    data = r.content
+    if crop:
+        try:
+            # Cropping is CPU work, so run it in a thread to keep other downloads moving
+            data = await asyncio.to_thread(crop_to_16_9, data)
+        except Exception as e:
+            # Keep the uncropped image rather than losing the download
+            print(f"Error processing image {local_path}: {e}")
+
+    try:
+        with open(local_path, "wb") as f:
+            f.write(data)
+    except OSError as e:
+        print(f"Failed to save {local_path}: {e}")
+        return None
+
+    print(f"Downloaded: {local_path}")
+    return local_path
+
+
+async def download_thumbnail(client, url, local_path):
+    """
+    Downloads one video's thumbnail to local_path.
+    maxresdefault.jpg is already 16:9 and needs no cropping, but YouTube doesn't
+    generate it for every video, so fall back to the 4:3 hqdefault.jpg and crop that.
+    """
+    # All sizes of a video's thumbnail share a folder: https://i.ytimg.com/vi/<video_id>/
+    thumbnail_folder = url.rsplit('/', 1)[0]
+
+    if await download_file(client, f"{thumbnail_folder}/maxresdefault.jpg", local_path, missing_ok=True) is not None:
+        return True
+
+    # Either there is no maxresdefault.jpg for this video (404) or the download failed
+    print(f"Using hqdefault.jpg for {local_path}.")
+    return await download_file(client, f"{thumbnail_folder}/hqdefault.jpg", local_path, crop=True) is not None
+
+
+async def download_thumbnails(thumbnails):
+    """
+    Downloads all (index, url) thumbnails concurrently and returns how many succeeded.
+    With HTTP/2 every request is multiplexed over a single connection, so there is
+    only one TCP+TLS handshake for the whole playlist. If h2 isn't installed, or the
+    server or a proxy only speaks HTTP/1.1, up to DOWNLOAD_POOL_SIZE connections
+    are used in parallel instead.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=HTTP2,
+        limits=httpx.Limits(max_connections=DOWNLOAD_POOL_SIZE, max_keepalive_connections=DOWNLOAD_POOL_SIZE),
+        retries=3, # Retry failed connection attempts
+    )
+
+    # Build every output path up front, outside the per-download code.
+    # YouTube thumbnail URLs are consistent, use the video index for a clean filename
+    local_paths = [os.path.join(OUTPUT_DIR, f"{i+1}_thumbnail.jpg") for i, _ in thumbnails]
+
+    async with httpx.AsyncClient(transport=transport, timeout=DOWNLOAD_TIMEOUT) as client:
+        results = await asyncio.gather(*(
+            download_thumbnail(client, url, local_path)
+            for (_, url), local_path in zip(thumbnails, local_paths)
+        ))
+    return sum(results)
+
 
 def scroll_to_end(page):
     """
-    Scrolls the page repeatedly until no new video elements are loaded, 
+    Scrolls the page repeatedly until the page stops growing, 
     ensuring all lazy-loaded content is visible.
     """
     print("Scrolling to load all playlist videos...")
-    last_video_count = 0
-    consecutive_same_count = 0
-    max_attempts = 10  # Stop after 10 attempts where no new videos are loaded
+    last_height = page.evaluate("document.body.scrollHeight")
+    consecutive_same_height = 0
+    max_stable_attempts = 2  # Stop once the page height hasn't changed for 2 scrolls
 
-    while consecutive_same_count < max_attempts:
+    while consecutive_same_height < max_stable_attempts:
         # Scroll to the bottom of the page
         page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
         
-        # Wait for dynamic content to potentially load
-        time.sleep(2) 
+        # Wait until the next batch of rows makes the page taller, rather than
+        # sleeping a fixed time. If it doesn't grow in time, treat it as no new videos.
+        try:
+            page.wait_for_function(PAGE_GREW_JS, arg=last_height, timeout=SCROLL_LOAD_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            pass
         
-        # Count the number of video elements currently loaded
-        current_videos = page.locator(VIDEO_ROW_SELECTOR).all()
-        current_video_count = len(current_videos)
+        current_height = page.evaluate("document.body.scrollHeight")
 
-        if current_video_count > last_video_count:
+        if current_height > last_height:
+            # Count the number of video elements currently loaded
+            current_video_count = page.evaluate(COUNT_VIDEO_ROWS_JS, VIDEO_ROW_SELECTOR)
             print(f"Loaded {current_video_count} videos so far...")
-            last_video_count = current_video_count
-            consecutive_same_count = 0  # Reset counter since new content was found
+            last_height = current_height
+            consecutive_same_height = 0  # Reset counter since new content was found
         else:
-            consecutive_same_count += 1
-            print(f"No new videos loaded in this attempt. Attempts remaining: {max_attempts - consecutive_same_count}")
+            consecutive_same_height += 1
+            print(f"No new videos loaded in this attempt. Attempts remaining: {max_stable_attempts - consecutive_same_height}")
 
-    print(f"Finished scrolling. Total videos found: {last_video_count}")
+    print(f"Finished scrolling. Total videos found: {page.evaluate(COUNT_VIDEO_ROWS_JS, VIDEO_ROW_SELECTOR)}")
         
 
-def scrape_thumbnails():
-    """Main function to scrape and download YouTube playlist thumbnails."""
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+def get_thumbnails_from_html():
+    """
+    Builds the thumbnail URLs from the video IDs in the playlist page's HTML,
+    without starting a browser. Returns a list of (index, url) pairs, or None
+    if the HTML doesn't contain the whole playlist and the browser is needed.
+    """
+    print(f"Fetching {PLAYLIST_URL}")
+    try:
+        r = httpx.get(PLAYLIST_URL, timeout=10, follow_redirects=True)
+        r.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Failed to fetch playlist page: {e}")
+        return None
+
+    html = r.text
+    # dict.fromkeys removes duplicates while keeping playlist order
+    video_ids = list(dict.fromkeys(PLAYLIST_VIDEO_ID_PATTERN.findall(html)))
+
+    if not video_ids:
+        # e.g. a cookie consent page, or YouTube changed its page data
+        print("No video IDs found in the playlist HTML.")
+        return None
+    if PLAYLIST_CONTINUATION_MARKER in html:
+        # Later pages are only loaded by scrolling, which needs the browser
+        print(f"Playlist HTML only lists the first {len(video_ids)} videos.")
+        return None
 
+    print(f"Found {len(video_ids)} videos in the playlist HTML.")
+    return [(i, THUMBNAIL_URL_TEMPLATE.format(video_id=video_id)) for i, video_id in enumerate(video_ids)]
+
+
+def get_thumbnails_from_browser():
+    """
+    Opens the playlist in Chromium, scrolls until every video is loaded and
+    collects the thumbnail URLs. Returns a list of (index, url) pairs.
+    """
     with sync_playwright() as p:
         # Launch Chromium browser (headless=False will show the browser window)
         browser = p.chromium.launch(headless=False)
@@ -127,62 +296,58 @@ def scrape_thumbnails():
         # Scroll to ensure all videos are loaded
         scroll_to_end(page)
         
-        # Find all thumbnail images using the selector
-        images = page.locator(THUMBNAIL_SELECTOR).all()
+        # Wait once, in the browser, for the lazy-loaded sources to be filled in.
+        # This returns as soon as they are all ready instead of sleeping per image.
+        try:
+            page.wait_for_function(ALL_THUMBNAILS_LOADED_JS, arg=THUMBNAIL_SELECTOR, timeout=THUMBNAIL_LOAD_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            print(f"Some thumbnails were still placeholders after {THUMBNAIL_LOAD_TIMEOUT_MS // 1000}s. Continuing with the ones that loaded.")
         
-        if not images:
-            print("No images found with the specified selector. Check the playlist is public.")
-            browser.close()
-            return
-
-        print(f"Found {len(images)} potential thumbnail elements. Starting targeted download...")
+        # Read every thumbnail's src in a single browser call rather than one call per image
+        srcs = page.eval_on_selector_all(THUMBNAIL_SELECTOR, "imgs => imgs.map(img => img.src || '')")
         
-        downloaded_count = 0
-        
-        # Extract and download the source attribute (src) for each image
-        for i, img_element in enumerate(images):
-            
-            # --- Targeted Waiting Loop for Lazy-Loaded Image SRC ---
-            src = None
-            max_wait_time = 5 # Total wait time for the attribute to populate
-            wait_step = 1     # Check every 1 second
-            
-            # Poll for the 'src' attribute to be populated
-            for attempt in range(int(max_wait_time / wait_step)):
-                # Get the 'src' attribute. Playwright will fetch the current value.
-                src = img_element.get_attribute("src")
-                
-                # Check if the source is populated and not a data URI placeholder
-                if src and not src.startswith("data:"):
-                    break  # URL found! Exit the waiting loop
-                
-                # If not found, wait and try again
-                time.sleep(wait_step)
-            # --- End Targeted Waiting Loop ---
-
-            # Final check after the waiting attempts
-            if not src or src.startswith("data:"):
-                # Print a message for debugging why an image was skipped
-                print(f"Skipping video {i+1}: Image source is still placeholder or empty after {max_wait_time}s wait.")
-                continue
-                
-            # Clean the URL by removing query parameters (e.g., ?sqp=...)
-            # This ensures we get the clean image file (like hqdefault.jpg)
-            cleaned_src = src.split('?')[0]
-
-            # YouTube thumbnail URLs are consistent, use the video index for a clean filename
-            filename = f"{i+1}_thumbnail.jpg"
-            
-            # Download the file
-            local_path = download_file(cleaned_src, filename)
-            
-            if local_path:
-                # NEW: Crop the downloaded file to 16:9
-                crop_to_16_9(local_path)
-                downloaded_count += 1
-            
-        print(f"Scraping complete. Downloaded {downloaded_count} unique thumbnails to the '{OUTPUT_DIR}' directory.")
+        # The browser isn't needed for the downloads themselves
         browser.close()
 
+    print(f"Found {len(srcs)} potential thumbnail elements. Collecting image URLs...")
+    
+    # (index, url) pairs to download once every URL has been collected
+    thumbnails = []
+    
+    for i, src in enumerate(srcs):
+        # Skip images whose source is still empty or a data URI placeholder
+        if not src or src.startswith("data:"):
+            # Print a message for debugging why an image was skipped
+            print(f"Skipping video {i+1}: Image source is still placeholder or empty.")
+            continue
+            
+        # Clean the URL by removing query parameters (e.g., ?sqp=...)
+        # This ensures we get the clean image file (like hqdefault.jpg)
+        cleaned_src = src.split('?')[0]
+        thumbnails.append((i, cleaned_src))
+
+    return thumbnails
+
+
+def scrape_thumbnails():
+    """Main function to scrape and download YouTube playlist thumbnails."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # A single HTTP request is enough for most playlists; only fall back to
+    # the (much slower) browser when the HTML doesn't list every video
+    thumbnails = get_thumbnails_from_html()
+    if thumbnails is None:
+        print("Falling back to loading the playlist in the browser...")
+        thumbnails = get_thumbnails_from_browser()
+
+    if not thumbnails:
+        print("No images found with the specified selector. Check the playlist is public.")
+        return
+
+    print(f"Downloading {len(thumbnails)} thumbnails...")
+    downloaded_count = asyncio.run(download_thumbnails(thumbnails))
+
+    print(f"Scraping complete. Downloaded {downloaded_count} unique thumbnails to the '{OUTPUT_DIR}' directory.")
+
 if __name__ == "__main__":
     scrape_thumbnails()